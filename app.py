@@ -6,12 +6,27 @@ A Streamlit web app for the Performance-Based Budgeting AI Agent
 
 import streamlit as st
 import requests
-import pandas as pd
-import json
-from typing import Dict, List, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Iterator, Optional, Sequence
 import io
+import hashlib
+import openpyxl
+import orjson
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+_XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+_DEFAULT_URL = 'https://www.example.gov'
+
+# Typical wall time of the concurrent inventory + cost calls, used to pace the progress bar
+_EXPECTED_ANALYSIS_SECONDS = 45
+
+# How often the background thread re-checks each service's /health endpoint
+_STATUS_REFRESH_SECONDS = 60
+
 # Set page config
 st.set_page_config(
     page_title="PBB AI Agent",
@@ -20,12 +35,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS to match Tyler Technologies styling
-st.markdown("""
+# Custom CSS to match Tyler Technologies styling. Google Fonts is loaded with
+# <link> tags rather than a CSS @import so the font fetch doesn't block the stylesheet
+_CSS = """
 <style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
     /* Global styling */
     .stApp {
         font-family: 'Inter', sans-serif;
@@ -167,7 +180,81 @@ st.markdown("""
         padding-bottom: 2rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Kept out of _CSS: a Markdown HTML block that opens with <link> ends at the
+# first blank line, which would spill the rest of the stylesheet out as text
+_FONT_LINKS = """
+<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+<link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
+"""
+
+st.markdown(_CSS, unsafe_allow_html=True)
+st.markdown(_FONT_LINKS, unsafe_allow_html=True)
+
+def _files_key(files: Dict) -> str:
+    """Content hash of a multipart files dict, used as the cache key"""
+    digest = hashlib.sha256()
+    for field, (filename, content, _) in files.items():
+        digest.update(field.encode())
+        digest.update(filename.encode())
+        digest.update(content)
+    return digest.hexdigest()
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def _post_service(_session: requests.Session, url: str, files_key: str, _files: Dict, data: Optional[Dict], fallback_message: str) -> Dict:
+    """POST to a PBB service, caching the payload for identical uploads and parameters.
+    
+    Errors are raised rather than returned so failed calls are never cached.
+    """
+    response = _session.post(url, files=_files, data=data, timeout=120)
+    if response.status_code >= 400:
+        # Same wording as raise_for_status(), which users see in st.error
+        kind = "Client Error" if response.status_code < 500 else "Server Error"
+        raise requests.HTTPError(
+            f"{response.status_code} {kind}: {response.reason} for url: {response.url}",
+            response=response
+        )
+    
+    # Handle response - might be JSON or file download
+    content_type = response.headers.get('content-type', '').split(';', 1)[0].strip()
+    if content_type == 'application/json':
+        return orjson.loads(response.content)
+    # If it returns a file, we'll need to parse it
+    return {"message": fallback_message}
+
+def _iter_sheet_rows(content: bytes) -> Iterator[Sequence]:
+    """Yield the first worksheet's row values one row at a time"""
+    # Read-only mode streams rows instead of building the full workbook, and
+    # skipping external links avoids loading their cached copies
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True, keep_links=False)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+@st.cache_data(show_spinner=False)
+def _quick_budget_total(budget_bytes: bytes) -> Optional[float]:
+    """Sum the Budget column of the uploaded budgets workbook"""
+    rows = _iter_sheet_rows(budget_bytes)
+    try:
+        header = next(rows, ())
+        columns = {str(name).strip().lower(): i for i, name in enumerate(header) if name is not None}
+        if 'budget' not in columns:
+            return None
+        
+        budget_col = columns['budget']
+        total = 0.0
+        for row in rows:
+            value = row[budget_col] if budget_col < len(row) else None
+            # bool is an int subclass; TRUE/FALSE cells are not amounts
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total += value
+        return total
+    except Exception:
+        return None
+    finally:
+        rows.close()
 
 class PBBToolkit:
     """Wrapper for all PBB microservices"""
@@ -181,31 +268,75 @@ class PBBToolkit:
             'program_evaluation': 'https://program-evaluation-predictor.onrender.com',
             'program_insights': 'https://program-insights-predictor.onrender.com'
         }
+        
+        # One pooled session for all services so keep-alive connections
+        # (and their TLS handshakes) are reused across calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=3,
+                read=False,  # never re-send a POST that timed out; the job may still be running
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=["POST", "GET"]
+            )
+        )
+        self.session.mount("https://", adapter)
+        
+        # Last known status of each service, kept fresh by a background thread so
+        # the sidebar never waits on the network. Its first round of checks also
+        # opens a pooled connection to every host (and wakes sleeping Render
+        # services) while the user is still choosing files
+        self.service_status = {name: "⚪ Checking..." for name in self.services}
+        threading.Thread(target=self._monitor_services, daemon=True).start()
+    
+    def _check_service(self, url: str) -> str:
+        """Status label for one service's health endpoint"""
+        try:
+            response = self.session.get(f"{url}/health", timeout=(3, 60))
+        except requests.Timeout:
+            # Render spins idle services down; the request wakes them up
+            return "🟡 Waking up"
+        except requests.RequestException:
+            return "🔴 Unavailable"
+        return "🟢 Active" if 200 <= response.status_code < 300 else "🔴 Unavailable"
+    
+    def _monitor_services(self):
+        """Refresh service_status in parallel every _STATUS_REFRESH_SECONDS"""
+        with ThreadPoolExecutor(max_workers=len(self.services)) as executor:
+            while True:
+                statuses = executor.map(self._check_service, self.services.values())
+                # Swap in a complete dict so readers never see a partial update
+                self.service_status = dict(zip(self.services, statuses))
+                time.sleep(_STATUS_REFRESH_SECONDS)
+    
+    def _post(self, service: str, endpoint: str, files: Dict, data: Optional[Dict], fallback_message: str) -> Dict:
+        """POST to a service, reusing the cached result when inputs are unchanged"""
+        return _post_service(
+            self.session,
+            f"{self.services[service]}{endpoint}",
+            _files_key(files),
+            files,
+            data,
+            fallback_message
+        )
     
     def program_inventory(self, file_content: bytes, filename: str, org_url: str = "", programs_per_dept: int = 5) -> Dict:
         """Upload positions file and predict programs"""
         try:
             # Prepare the form data as your service expects
-            files = {'file': (filename, file_content, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+            files = {'file': (filename, file_content, _XLSX_MIME)}
             data = {
-                'org_url': org_url or 'https://www.example.gov',
+                'org_url': org_url or _DEFAULT_URL,
                 'programs_per_department': programs_per_dept
             }
             
-            response = requests.post(
-                f"{self.services['program_inventory']}/generate", 
-                files=files, 
-                data=data,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            # Handle response - might be JSON or file download
-            if response.headers.get('content-type', '').startswith('application/json'):
-                return {"success": True, "data": response.json()}
-            else:
-                # If it returns a file, we'll need to parse it
-                return {"success": True, "data": {"message": "Program inventory generated successfully"}}
+            return {"success": True, "data": self._post(
+                'program_inventory', '/generate', files, data,
+                "Program inventory generated successfully"
+            )}
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -214,21 +345,14 @@ class PBBToolkit:
         """Predict program costs using budget allocation service"""
         try:
             files = {
-                'program_inventory_file': ('programs.xlsx', program_file, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
-                'department_budget_file': ('budgets.xlsx', budget_file, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                'program_inventory_file': ('programs.xlsx', program_file, _XLSX_MIME),
+                'department_budget_file': ('budgets.xlsx', budget_file, _XLSX_MIME)
             }
             
-            response = requests.post(
-                f"{self.services['budget_allocation']}/allocate",
-                files=files,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            if response.headers.get('content-type', '').startswith('application/json'):
-                return {"success": True, "data": response.json()}
-            else:
-                return {"success": True, "data": {"message": "Budget allocation completed successfully"}}
+            return {"success": True, "data": self._post(
+                'budget_allocation', '/allocate', files, None,
+                "Budget allocation completed successfully"
+            )}
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -236,24 +360,16 @@ class PBBToolkit:
     def program_evaluation_predictor(self, programs_with_costs_file: bytes, org_url: str = "", cost_threshold: int = 100000) -> Dict:
         """Score programs strategically"""
         try:
-            files = {'file': ('programs_costs.xlsx', programs_with_costs_file, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+            files = {'file': ('programs_costs.xlsx', programs_with_costs_file, _XLSX_MIME)}
             data = {
-                'government_website_url': org_url or 'https://www.example.gov',
+                'government_website_url': org_url or _DEFAULT_URL,
                 'cost_threshold': cost_threshold
             }
             
-            response = requests.post(
-                f"{self.services['program_evaluation']}/analyze",
-                files=files,
-                data=data,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            if response.headers.get('content-type', '').startswith('application/json'):
-                return {"success": True, "data": response.json()}
-            else:
-                return {"success": True, "data": {"message": "Program evaluation completed successfully"}}
+            return {"success": True, "data": self._post(
+                'program_evaluation', '/analyze', files, data,
+                "Program evaluation completed successfully"
+            )}
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -261,25 +377,26 @@ class PBBToolkit:
     def program_insights_predictor(self, org_name: str, file_content: bytes) -> Dict:
         """Generate specific cost-saving and revenue recommendations"""
         try:
-            files = {'file': ('data.xlsx', file_content, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+            files = {'file': ('data.xlsx', file_content, _XLSX_MIME)}
             data = {'organization_name': org_name}
             
-            response = requests.post(
-                f"{self.services['program_insights']}/predict",
-                files=files,
-                data=data,
-                timeout=120
-            )
-            response.raise_for_status()
-            
-            if response.headers.get('content-type', '').startswith('application/json'):
-                return {"success": True, "data": response.json()}
-            else:
-                return {"success": True, "data": {"message": "Program insights generated successfully"}}
+            return {"success": True, "data": self._post(
+                'program_insights', '/predict', files, data,
+                "Program insights generated successfully"
+            )}
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+@st.cache_resource
+def get_toolkit() -> PBBToolkit:
+    """Shared toolkit so the connection pool survives script reruns.
+    
+    Unlike st.cache_data, st.cache_resource hands back the same object to every
+    rerun and every user session, so all of them share one HTTP connection pool.
+    """
+    return PBBToolkit()
+
 def main():
     # Custom header with Tyler Technologies styling
     st.markdown("""
@@ -290,22 +407,26 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    # Initialize toolkit - NO PARAMETERS!
+    toolkit = get_toolkit()
+    
     # Sidebar for information
     with st.sidebar:
-        st.markdown("### 🏛️ PBB AI Agent")
-        st.markdown("**Connected Services:**")
+        st.markdown("### 🏛️ PBB AI Agent\n**Connected Services:**")
         
         # Show service status
-        services_status = [
-            ("Program Inventory", "🟢 Active"),
-            ("Budget Allocation", "🟢 Active"),
-            ("Program Evaluation", "🟢 Active"),
-            ("Benchmark Analytics", "🟢 Active"),
-            ("Program Insights", "🟢 Active")
+        service_labels = [
+            ("Program Inventory", 'program_inventory'),
+            ("Budget Allocation", 'budget_allocation'),
+            ("Program Evaluation", 'program_evaluation'),
+            ("Benchmark Analytics", 'benchmark_analyzer'),
+            ("Program Insights", 'program_insights')
         ]
+        services_status = toolkit.service_status
         
-        for service, status in services_status:
-            st.markdown(f"• {service}: {status}")
+        st.markdown("  \n".join(
+            f"• {label}: {services_status[service]}" for label, service in service_labels
+        ))
         
         st.divider()
         
@@ -335,16 +456,15 @@ def main():
             - Tyler Technologies platform
             """)
     
-    # Initialize toolkit - NO PARAMETERS!
-    toolkit = PBBToolkit()
-    
     # Main content area with cards
     col1, col2 = st.columns([2, 1], gap="large")
     
     with col1:
         # Data Upload Card
-        st.markdown('<div class="analysis-card">', unsafe_allow_html=True)
-        st.markdown('<div class="section-header">📊 Data Upload & Analysis</div>', unsafe_allow_html=True)
+        st.markdown(
+            '<div class="analysis-card"><div class="section-header">📊 Data Upload & Analysis</div>',
+            unsafe_allow_html=True
+        )
         
         # File upload section
         st.markdown("**1. Upload Your Data**")
@@ -363,10 +483,21 @@ def main():
             key="budgets"
         )
         
+        # Show the budget total straight away instead of waiting on the services,
+        # recomputing it whenever the budgets upload is replaced or cleared
+        budget_file_id = budget_file.file_id if budget_file is not None else None
+        if budget_file_id != st.session_state.get('budget_file_id'):
+            st.session_state['budget_file_id'] = budget_file_id
+            budget_total = _quick_budget_total(budget_file.getvalue()) if budget_file is not None else None
+            if budget_total is None:
+                st.session_state.pop('total_budget', None)
+            else:
+                st.session_state['total_budget'] = budget_total
+        
         # Organization details
         org_url = st.text_input(
             "Organization Website URL",
-            value="https://www.example.gov",
+            value=_DEFAULT_URL,
             help="Your government organization's website URL"
         )
         
@@ -381,9 +512,11 @@ def main():
         if analysis_type == "🚀 Full Analysis (Recommended)":
             st.info("**Workflow:** Program Inventory → Cost Prediction → Strategic Scoring → Recommendations")
             
+            files_ready = positions_file is not None and budget_file is not None
+            
             col_btn1, col_btn2 = st.columns([1, 2])
             with col_btn1:
-                if st.button("🔍 Run Full Analysis", type="primary", disabled=not (positions_file and budget_file)):
+                if st.button("🔍 Run Full Analysis", type="primary", disabled=not files_ready):
                     run_full_analysis(toolkit, positions_file, budget_file, org_url)
                     
         elif analysis_type == "🔧 Individual Tools":
@@ -396,8 +529,10 @@ def main():
     
     with col2:
         # Results Dashboard Card
-        st.markdown('<div class="results-card">', unsafe_allow_html=True)
-        st.markdown('<div class="section-header">📈 Results Dashboard</div>', unsafe_allow_html=True)
+        st.markdown(
+            '<div class="results-card"><div class="section-header">📈 Results Dashboard</div>',
+            unsafe_allow_html=True
+        )
         
         # Display session state results
         if 'analysis_results' in st.session_state:
@@ -405,11 +540,11 @@ def main():
         else:
             st.info("Upload data and run analysis to see results here")
             
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Quick stats card
-        st.markdown('<div class="results-card">', unsafe_allow_html=True)
-        st.markdown('<div class="section-header">📊 Quick Stats</div>', unsafe_allow_html=True)
+        # Close the dashboard card and open the quick stats card in one write
+        st.markdown(
+            '</div><div class="results-card"><div class="section-header">📊 Quick Stats</div>',
+            unsafe_allow_html=True
+        )
         col_a, col_b = st.columns(2)
         with col_a:
             st.metric("Programs", st.session_state.get('total_programs', 0))
@@ -424,37 +559,58 @@ def run_full_analysis(toolkit: PBBToolkit, positions_file, budget_file, org_url:
     status_text = st.empty()
     
     try:
-        # Step 1: Program Inventory
-        status_text.text("🔍 Step 1/3: Identifying programs...")
-        progress_bar.progress(10)
-        
-        inventory_result = toolkit.program_inventory(
-            positions_file.getvalue(), 
-            positions_file.name,
-            org_url,
-            5  # programs per department
-        )
-        
-        if not inventory_result["success"]:
-            st.error(f"Program inventory failed: {inventory_result['error']}")
-            return
-        
-        progress_bar.progress(40)
-        
-        # Step 2: Cost Prediction
-        status_text.text("💰 Step 2/3: Predicting program costs...")
+        # Read each upload once and share the bytes between both requests
+        positions_bytes = positions_file.getvalue()
+        budget_bytes = budget_file.getvalue()
         
-        cost_result = toolkit.program_cost_predictor(
-            positions_file.getvalue(),  # Using positions file as program inventory input
-            budget_file.getvalue()
-        )
+        # Steps 1 & 2: Program Inventory and Cost Prediction are independent,
+        # so both requests are in flight at the same time
+        status_text.text("🔍 Steps 1-2/3: Identifying programs and predicting costs...")
+        progress_bar.progress(10)
         
-        if not cost_result["success"]:
-            st.error(f"Cost prediction failed: {cost_result['error']}")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            inventory_future = executor.submit(
+                toolkit.program_inventory,
+                positions_bytes,
+                positions_file.name,
+                org_url,
+                5  # programs per department
+            )
+            cost_future = executor.submit(
+                toolkit.program_cost_predictor,
+                positions_bytes,  # Using positions file as program inventory input
+                budget_bytes
+            )
+            
+            # Advance the bar with elapsed time while waiting, jumping ahead as
+            # each call finishes, and only send an update when it moves by 5%+
+            started = time.monotonic()
+            pending = {inventory_future, cost_future}
+            shown = 10
+            while pending:
+                _, pending = wait(pending, timeout=0.25)
+                elapsed = time.monotonic() - started
+                by_time = min(65, 10 + int(55 * elapsed / _EXPECTED_ANALYSIS_SECONDS))
+                by_completion = 10 + 30 * (2 - len(pending))
+                value = max(by_time, by_completion)
+                if value - shown >= 5:
+                    progress_bar.progress(value)
+                    shown = value
+        
+        inventory_result = inventory_future.result()
+        cost_result = cost_future.result()
+        
+        # Both calls have been reaped, so report every failure at once
+        failures = [
+            f"{step} failed: {result['error']}"
+            for step, result in (("Program inventory", inventory_result), ("Cost prediction", cost_result))
+            if not result["success"]
+        ]
+        if failures:
+            for failure in failures:
+                st.error(failure)
             return
         
-        progress_bar.progress(70)
-        
         # Step 3: Strategic Scoring  
         status_text.text("📊 Step 3/3: Scoring programs strategically...")
         
@@ -511,7 +667,7 @@ def show_individual_tools(toolkit: PBBToolkit, positions_file, budget_file, org_
     if tool_option == "Program Inventory":
         programs_per_dept = st.slider("Programs per Department", 1, 10, 5)
         
-        if st.button("Run Program Inventory") and positions_file:
+        if st.button("Run Program Inventory") and positions_file is not None:
             with st.spinner("Analyzing positions and predicting programs..."):
                 result = toolkit.program_inventory(
                     positions_file.getvalue(), 
@@ -528,7 +684,7 @@ def show_individual_tools(toolkit: PBBToolkit, positions_file, budget_file, org_
                     st.error(f"Error: {result['error']}")
     
     elif tool_option == "Program Cost Predictor":
-        if st.button("Run Cost Prediction") and positions_file and budget_file:
+        if st.button("Run Cost Prediction") and positions_file is not None and budget_file is not None:
             with st.spinner("Predicting program costs..."):
                 result = toolkit.program_cost_predictor(
                     positions_file.getvalue(),
@@ -545,7 +701,7 @@ def show_individual_tools(toolkit: PBBToolkit, positions_file, budget_file, org_
     elif tool_option == "Program Evaluation Predictor":
         cost_threshold = st.number_input("Cost Threshold ($)", min_value=10000, max_value=1000000, value=100000)
         
-        if st.button("Run Program Evaluation") and positions_file:
+        if st.button("Run Program Evaluation") and positions_file is not None:
             with st.spinner("Scoring programs strategically..."):
                 result = toolkit.program_evaluation_predictor(
                     positions_file.getvalue(),  # This would need to be the output from cost predictor
@@ -563,7 +719,7 @@ def show_individual_tools(toolkit: PBBToolkit, positions_file, budget_file, org_
     elif tool_option == "Program Insights Predictor":
         org_name = st.text_input("Organization Name", value="Your Government Organization")
         
-        if st.button("Generate Insights") and positions_file:
+        if st.button("Generate Insights") and positions_file is not None:
             with st.spinner("Generating program insights..."):
                 result = toolkit.program_insights_predictor(org_name, positions_file.getvalue())
                 